@@ -5,10 +5,11 @@ Contains the hardware interface and drivers for the Penny K Pinball PKONE
 platform hardware.
 """
 import asyncio
-from copy import deepcopy
+import re
 from typing import Optional, Dict, List, Tuple, Set
 
 from mpf.core.platform_batch_light_system import PlatformBatchLightSystem
+from mpf.core.utility_functions import Util
 from mpf.platforms.pkone.pkone_serial_communicator import PKONESerialCommunicator
 from mpf.platforms.pkone.pkone_extension import PKONEExtensionBoard
 from mpf.platforms.pkone.pkone_lightshow import PKONELightshowBoard
@@ -20,6 +21,12 @@ from mpf.platforms.pkone.pkone_lights import PKONESimpleLED, PKONESimpleLEDNumbe
 from mpf.core.platform import SwitchPlatform, DriverPlatform, LightsPlatform, SwitchSettings, DriverSettings, \
     DriverConfig, SwitchConfig, RepulseSettings, ServoPlatform
 
+# switch/coil/servo numbers use the format <board_address_id>-<number>
+BOARD_NUMBER_REGEX = re.compile(r'\s*(\d+)\s*-\s*(\d+)\s*')
+
+# maps the switch state characters ('0' and '1') of PSA messages to the states 0 and 1
+SWITCH_STATE_TABLE = bytes.maketrans(b'01', b'\x00\x01')
+
 
 # pylint: disable-msg=too-many-instance-attributes,too-many-public-methods
 class PKONEHardwarePlatform(SwitchPlatform, DriverPlatform, LightsPlatform, ServoPlatform):
@@ -32,7 +39,10 @@ class PKONEHardwarePlatform(SwitchPlatform, DriverPlatform, LightsPlatform, Serv
     """
 
     __slots__ = ["config", "serial_connections", "pkone_extensions", "pkone_lightshows", "_light_system",
-                 "_watchdog_task", "hw_switch_data", "controller_connection", "pkone_commands"]
+                 "_watchdog_task", "hw_switch_data", "controller_connection", "pkone_commands",
+                 "_coil_number_cache", "_switch_number_cache", "_servo_number_cache",
+                 "_board_switch_numbers", "_board_switch_offsets", "_process_switch", "_send", "_boards_info",
+                 "_controllers_info"]
 
     def __init__(self, machine) -> None:
         """Initialize PKONE platform."""
@@ -43,15 +53,25 @@ class PKONEHardwarePlatform(SwitchPlatform, DriverPlatform, LightsPlatform, Serv
         self.pkone_lightshows = {}          # type: Dict[int, PKONELightshowBoard]
         self._light_system = None           # type: Optional[PlatformBatchLightSystem]
         self._watchdog_task = None
-        self.hw_switch_data = dict()
-
-        self.pkone_commands = {'PCN': lambda x, y: None,            # connected Nano processor
-                               'PCB': lambda x, y: None,            # connected board
-                               'PWD': lambda x, y: None,            # watchdog
-                               'PWF': lambda x, y: None,            # watchdog stop
-                               'PSA': self.receive_all_switches,    # all switch states
-                               'PSW': self.receive_switch,          # switch state change
-                               'PXX': self.receive_error,           # error
+        self.hw_switch_data = bytearray()   # one byte (0 or 1) per switch on all extension boards
+        self._coil_number_cache = dict()    # type: Dict[str, PKONECoilNumber]
+        self._switch_number_cache = dict()  # type: Dict[str, PKONESwitchNumber]
+        self._servo_number_cache = dict()   # type: Dict[str, PKONEServoNumber]
+        self._board_switch_numbers = dict()  # type: Dict[int, List[PKONESwitchNumber]]
+        self._board_switch_offsets = dict()  # type: Dict[int, int]
+        self._process_switch = None
+        self._send = None
+        self._boards_info = ""
+        self._controllers_info = None       # type: Optional[str]
+        self._update_boards_info()
+
+        self.pkone_commands = {b'PCN': lambda x, y: None,            # connected Nano processor
+                               b'PCB': lambda x, y: None,            # connected board
+                               b'PWD': lambda x, y: None,            # watchdog
+                               b'PWF': lambda x, y: None,            # watchdog stop
+                               b'PSA': self.receive_all_switches,    # all switch states
+                               b'PSW': self.receive_switch,          # switch state change
+                               b'PXX': self.receive_error,           # error
                                }
 
         # Set platform features. Each platform interface can change
@@ -85,24 +105,36 @@ class PKONEHardwarePlatform(SwitchPlatform, DriverPlatform, LightsPlatform, Serv
             self._watchdog_task.cancel()
             self._watchdog_task = None
 
-        # wait 100ms for the messages to be send
-        self.machine.clock.loop.run_until_complete(asyncio.sleep(.1))
-
         if self.controller_connection:
+            # wait (at most 100ms) for the messages to be sent
+            try:
+                self.machine.clock.loop.run_until_complete(
+                    asyncio.wait_for(self.controller_connection.drain(), timeout=.1))
+            except asyncio.TimeoutError:
+                self.log.warning("Timed out waiting for the last messages to be sent to the PKONE controller.")
+
             self.controller_connection.stop()
             self.controller_connection = None
 
         self.serial_connections = set()
+        self._controllers_info = None
+        self._process_switch = None
+        self._send = None
 
     async def start(self):
         """Start listening for commands and schedule watchdog."""
+        # bind frequently used methods once (used for every switch change, watchdog ping and light update)
+        self._process_switch = self.machine.switch_controller.process_switch_by_num
+        self._send = self.controller_connection.send
+
         if self.config['watchdog']:
             # Configure the watchdog timeout interval and start it
             self.controller_connection.send('PWS{:04d}'.format(self.config['watchdog']))
 
-            # Schedule the watchdog task to send at half the configured interval
-            self._watchdog_task = self.machine.clock.schedule_interval(self._update_watchdog,
-                                                                       self.config['watchdog'] / 2000)
+            # Start the watchdog task to send at half the configured interval
+            self._watchdog_task = self.machine.clock.loop.create_task(
+                self._watchdog_loop(self.config['watchdog'] / 2000))
+            self._watchdog_task.add_done_callback(Util.raise_exceptions)
 
         for connection in self.serial_connections:
             await connection.start_read_loop()
@@ -110,46 +142,61 @@ class PKONEHardwarePlatform(SwitchPlatform, DriverPlatform, LightsPlatform, Serv
         self._initialize_led_hw_driver_alignment()
         self._light_system.start()
 
+    async def _watchdog_loop(self, wait_time):
+        """Periodically send the watchdog ping until cancelled."""
+        update_watchdog = self._update_watchdog
+        while True:
+            await asyncio.sleep(wait_time)
+            update_watchdog()
+
     def _update_watchdog(self):
         """Send Watchdog ping command."""
-        self.controller_connection.send('PWD')
+        self._send('PWD')
 
     def get_info_string(self):
         """Dump infos about boards."""
         if not self.serial_connections:
             return "No connection to any Penny K Pinball PKONE controller board."
 
-        infos = "Penny K Pinball Hardware\n"
-        infos += "------------------------\n"
-        infos += " - Connected Controllers:\n"
-        for connection in sorted(self.serial_connections, key=lambda x: x.port):
-            infos += "   -> PKONE Nano - Port: {} at {} baud " \
-                     "(firmware v{}, hardware rev {}).\n".format(connection.port,
-                                                                 connection.baud,
-                                                                 connection.remote_firmware,
-                                                                 connection.remote_hardware_rev)
-
-        infos += "\n - Extension boards:\n"
+        if self._controllers_info is None:
+            self._controllers_info = "".join(
+                "   -> PKONE Nano - Port: {} at {} baud "
+                "(firmware v{}, hardware rev {}).\n".format(connection.port,
+                                                            connection.baud,
+                                                            connection.remote_firmware,
+                                                            connection.remote_hardware_rev)
+                for connection in sorted(self.serial_connections, key=lambda x: x.port))
+
+        return "".join(["Penny K Pinball Hardware\n",
+                        "------------------------\n",
+                        " - Connected Controllers:\n",
+                        self._controllers_info,
+                        self._boards_info])
+
+    def _update_boards_info(self):
+        """Build the (static) board section of the info string after boards have been registered."""
+        infos = ["\n - Extension boards:\n"]
         for extension in self.pkone_extensions.values():
-            infos += "   -> Address ID: {} (firmware v{}, hardware rev {})\n".format(extension.addr,
-                                                                                     extension.firmware_version,
-                                                                                     extension.hardware_rev)
+            infos.append("   -> Address ID: {} (firmware v{}, hardware rev {})\n".format(extension.addr,
+                                                                                         extension.firmware_version,
+                                                                                         extension.hardware_rev))
 
-        infos += "\n - Lightshow boards:\n"
+        infos.append("\n - Lightshow boards:\n")
         for lightshow in self.pkone_lightshows.values():
-            infos += "   -> Address ID: {} ({} firmware v{}, " \
-                     "hardware rev {})\n".format(lightshow.addr,
-                                                 'RGBW' if lightshow.rgbw_firmware else 'RGB',
-                                                 lightshow.firmware_version,
-                                                 lightshow.hardware_rev)
+            infos.append("   -> Address ID: {} ({} firmware v{}, "
+                         "hardware rev {})\n".format(lightshow.addr,
+                                                     'RGBW' if lightshow.rgbw_firmware else 'RGB',
+                                                     lightshow.firmware_version,
+                                                     lightshow.hardware_rev))
 
-        return infos
+        self._boards_info = "".join(infos)
 
     async def _connect_to_hardware(self):
         """Connect to the port in the config."""
         comm = PKONESerialCommunicator(platform=self, port=self.config['port'], baud=self.config['baud'])
         await comm.connect()
         self.serial_connections.add(comm)
+        self._controllers_info = None
 
     def register_extension_board(self, board: PKONEExtensionBoard):
         """Register an Extension board."""
@@ -157,10 +204,16 @@ class PKONEHardwarePlatform(SwitchPlatform, DriverPlatform, LightsPlatform, Serv
             raise AssertionError("Duplicate address id: a board has already been "
                                  "registered at address {}".format(board.addr))
 
-        if board.addr not in range(8):
+        if not 0 <= board.addr < 8:
             raise AssertionError("Address out of range: Extension board address id must be between 0 and 7")
 
         self.pkone_extensions[board.addr] = board
+        self._board_switch_numbers[board.addr] = [PKONESwitchNumber(board.addr, switch_number)
+                                                  for switch_number in range(1, board.switch_count + 1)]
+        self._board_switch_offsets[board.addr] = len(self.hw_switch_data)
+        self.hw_switch_data += bytes(board.switch_count)
+        self._clear_number_caches()
+        self._update_boards_info()
 
     def register_lightshow_board(self, board: PKONELightshowBoard):
         """Register a Lightshow board."""
@@ -168,21 +221,29 @@ class PKONEHardwarePlatform(SwitchPlatform, DriverPlatform, LightsPlatform, Serv
             raise AssertionError("Duplicate address id: a board has already been "
                                  "registered at address {}".format(board.addr))
 
-        if board.addr not in range(4):
+        if not 0 <= board.addr < 4:
             raise AssertionError("Address out of range: Lightshow board address id must be between 0 and 3")
 
         self.pkone_lightshows[board.addr] = board
+        self._clear_number_caches()
+        self._update_boards_info()
+
+    def _clear_number_caches(self):
+        """Clear parsed coil/switch/servo numbers (the result depends on the registered boards)."""
+        self._coil_number_cache.clear()
+        self._switch_number_cache.clear()
+        self._servo_number_cache.clear()
 
-    def process_received_message(self, msg: str):
+    def process_received_message(self, msg: bytes):
         """Send an incoming message from the PKONE controller to the proper method for servicing.
 
         Args:
         ----
-            msg: messaged which was received
+            msg: messaged which was received (raw bytes as read from the serial port)
         """
         assert self.log is not None
         cmd = msg[0:3]
-        payload = msg[3:].replace('E', '')
+        payload = msg[3:].replace(b'E', b'')
 
         # Can't use try since it swallows too many errors for now
         if cmd in self.pkone_commands:
@@ -192,16 +253,19 @@ class PKONEHardwarePlatform(SwitchPlatform, DriverPlatform, LightsPlatform, Serv
 
     def receive_error(self, msg):
         """Receive an error message from the controller."""
-        self.log.error("Received an error message from the controller: %s", msg)
+        self.log.error("Received an error message from the controller: %s", msg.decode())
 
     def _parse_coil_number(self, number: str) -> PKONECoilNumber:
-        try:
-            board_id_str, coil_num_str = number.split("-")
-        except ValueError:
+        coil_number = self._coil_number_cache.get(number)
+        if coil_number:
+            return coil_number
+
+        match = BOARD_NUMBER_REGEX.fullmatch(number)
+        if not match:
             raise AssertionError("Invalid coil number {}".format(number))
 
-        board_id = int(board_id_str)
-        coil_num = int(coil_num_str)
+        board_id = int(match.group(1))
+        coil_num = int(match.group(2))
 
         if board_id not in self.pkone_extensions:
             raise AssertionError("PKONE Extension {} does not exist for coil {}".format(board_id, number))
@@ -216,7 +280,9 @@ class PKONEHardwarePlatform(SwitchPlatform, DriverPlatform, LightsPlatform, Serv
                 "({first_coil} - {last_coil}). Coil: {number}".format(
                     board_id=board_id, coil_count=coil_count, first_coil=1, last_coil=coil_count, number=number))
 
-        return PKONECoilNumber(board_id, coil_num)
+        coil_number = PKONECoilNumber(board_id, coil_num)
+        self._coil_number_cache[number] = coil_number
+        return coil_number
 
     def configure_driver(self, config: DriverConfig, number: str, platform_settings: dict) -> PKONECoil:
         """Configure a coil/driver.
@@ -229,8 +295,8 @@ class PKONEHardwarePlatform(SwitchPlatform, DriverPlatform, LightsPlatform, Serv
 
         Returns: Coil/driver object
         """
-        # dont modify the config. make a copy
-        platform_settings = deepcopy(platform_settings)
+        # dont modify the config. make a copy (pkone_coils settings only contain scalars so a shallow copy is enough)
+        platform_settings = dict(platform_settings)
 
         if not self.controller_connection:
             raise AssertionError('A request was made to configure a PKONE coil, but no '
@@ -338,13 +404,16 @@ class PKONEHardwarePlatform(SwitchPlatform, DriverPlatform, LightsPlatform, Serv
         raise AssertionError("Single-wound coils with EOS are not implemented in PKONE hardware.")
 
     def _parse_servo_number(self, number: str) -> PKONEServoNumber:
-        try:
-            board_id_str, servo_num_str = number.split("-")
-        except ValueError:
+        servo_number = self._servo_number_cache.get(number)
+        if servo_number:
+            return servo_number
+
+        match = BOARD_NUMBER_REGEX.fullmatch(number)
+        if not match:
             raise AssertionError("Invalid servo number {}".format(number))
 
-        board_id = int(board_id_str)
-        servo_num = int(servo_num_str)
+        board_id = int(match.group(1))
+        servo_num = int(match.group(2))
 
         if board_id not in self.pkone_extensions:
             raise AssertionError("PKONE Extension {} does not exist for servo {}".format(board_id, number))
@@ -357,12 +426,14 @@ class PKONEHardwarePlatform(SwitchPlatform, DriverPlatform, LightsPlatform, Serv
                                  "Servo: {} is not a valid number.".format(
                                      board_id, servo_count, driver_count + 1, driver_count + servo_count, number))
 
-        return PKONEServoNumber(board_id, servo_num)
+        servo_number = PKONEServoNumber(board_id, servo_num)
+        self._servo_number_cache[number] = servo_number
+        return servo_number
 
     async def configure_servo(self, number: str) -> PKONEServo:
         """Configure a servo."""
         servo_number = self._parse_servo_number(str(number))
-        return PKONEServo(servo_number, self.controller_connection)
+        return PKONEServo(servo_number, self.controller_connection.send)
 
     @classmethod
     def get_coil_config_section(cls):
@@ -370,13 +441,16 @@ class PKONEHardwarePlatform(SwitchPlatform, DriverPlatform, LightsPlatform, Serv
         return "pkone_coils"
 
     def _parse_switch_number(self, number: str) -> PKONESwitchNumber:
-        try:
-            board_id_str, switch_num_str = number.split("-")
-        except ValueError:
+        switch_number = self._switch_number_cache.get(number)
+        if switch_number:
+            return switch_number
+
+        match = BOARD_NUMBER_REGEX.fullmatch(number)
+        if not match:
             raise AssertionError("Invalid switch number {}".format(number))
 
-        board_id = int(board_id_str)
-        switch_num = int(switch_num_str)
+        board_id = int(match.group(1))
+        switch_num = int(match.group(2))
 
         if board_id not in self.pkone_extensions:
             raise AssertionError("PKONE Extension {} does not exist for switch {}".format(board_id, number))
@@ -388,7 +462,9 @@ class PKONEHardwarePlatform(SwitchPlatform, DriverPlatform, LightsPlatform, Serv
             raise AssertionError("PKONE Extension {} only has {} switches. Switch: {}".format(
                 board_id, self.pkone_extensions[board_id].switch_count, number))
 
-        return PKONESwitchNumber(board_id, switch_num)
+        switch_number = PKONESwitchNumber(board_id, switch_num)
+        self._switch_number_cache[number] = switch_number
+        return switch_number
 
     def configure_switch(self, number: str, config: SwitchConfig, platform_config: dict) -> PKONESwitch:
         """Configure the switch object for a PKONE controller.
@@ -409,19 +485,18 @@ class PKONEHardwarePlatform(SwitchPlatform, DriverPlatform, LightsPlatform, Serv
             raise AssertionError("A request was made to configure a PKONE switch, but no "
                                  "connection to PKONE controller is available")
 
-        try:
-            switch_number = self._parse_switch_number(number)
-        except ValueError:
-            raise AssertionError("Could not parse switch number {}/{}. Seems "
-                                 "to be not a valid switch number for the"
-                                 "PKONE platform.".format(config.name, number))
+        switch_number = self._parse_switch_number(number)
 
         self.debug_log("PKONE Switch: %s (%s)", number, config.name)
         return PKONESwitch(config, switch_number, self)
 
     async def get_hw_switch_states(self) -> Dict[str, bool]:
         """Return hardware states."""
-        return self.hw_switch_data
+        hw_states = dict()
+        for board_address_id, switch_numbers in self._board_switch_numbers.items():
+            offset = self._board_switch_offsets[board_address_id]
+            hw_states.update(zip(switch_numbers, self.hw_switch_data[offset:offset + len(switch_numbers)]))
+        return hw_states
 
     def receive_all_switches(self, msg):
         """Process the all switch states message."""
@@ -430,26 +505,40 @@ class PKONEHardwarePlatform(SwitchPlatform, DriverPlatform, LightsPlatform, Serv
         self.debug_log("Received all switch states (PSA): %s", msg)
 
         # the message payload is delimited with an 'X' character for the switches on each board
-        # The first character is the board address ID
-        board_address_id = int(msg[0])
-        switch_states = msg[1:]
-
-        # There is one character for each switch on the board (1 = active, 0 = inactive)
-        # Loop over each character and map the state to the appropriate switch number
-        for index, state in enumerate(switch_states):
-            self.hw_switch_data[PKONESwitchNumber(board_address_id=board_address_id,
-                                                  switch_number=index + 1)] = int(state)
+        for board_switch_states in msg.split(b'X'):
+            if not board_switch_states:
+                continue
+
+            # The first character is the board address ID
+            board_address_id = board_switch_states[0] - 0x30
+            switch_numbers = self._board_switch_numbers.get(board_address_id)
+            if not switch_numbers:
+                self.log.warning("Received switch states for unknown extension board %s", board_address_id)
+                continue
+
+            # There is one character for each switch on the board (1 = active, 0 = inactive)
+            # Translate the characters (ASCII '0' or '1') to states and store them in the board's slice
+            states = board_switch_states[1:len(switch_numbers) + 1].translate(SWITCH_STATE_TABLE)
+            offset = self._board_switch_offsets[board_address_id]
+            self.hw_switch_data[offset:offset + len(states)] = states
 
     def receive_switch(self, msg):
         """Process a single switch state change."""
         # The PSW message contains the following information:
         # [PSW opcode] + [board address id] + switch number + switch state (0 or 1) + E
         self.debug_log("Received switch state change (PSW): %s", msg)
-        switch_number = PKONESwitchNumber(int(msg[0]), int(msg[1:3]))
-        switch_state = int(msg[-1])
-        self.machine.switch_controller.process_switch_by_num(state=switch_state,
-                                                             num=switch_number,
-                                                             platform=self)
+        board_address_id = msg[0] - 0x30
+        switch_num = int(msg[1:3])
+        switch_state = msg[-1] - 0x30
+        switch_numbers = self._board_switch_numbers.get(board_address_id)
+        if switch_numbers and 0 < switch_num <= len(switch_numbers):
+            # reuse the switch number created when the board was registered
+            switch_number = switch_numbers[switch_num - 1]
+            self.hw_switch_data[self._board_switch_offsets[board_address_id] + switch_num - 1] = switch_state
+        else:
+            switch_number = PKONESwitchNumber(board_address_id, switch_num)
+
+        self._process_switch(state=switch_state, num=switch_number, platform=self)
 
     # pylint: disable-msg=too-many-locals
     async def _send_multiple_light_update(self, sequential_brightness_list: List[Tuple[PKONELEDChannel,
@@ -525,7 +614,7 @@ class PKONEHardwarePlatform(SwitchPlatform, DriverPlatform, LightsPlatform, Serv
                                                   len(sequential_brightness_list) // channel_grouping,
                                                   int(common_fade_ms / 10),
                                                   "".join("%03d" % (b[1] * 255) for b in sequential_brightness_list))
-        self.controller_connection.send(cmd)
+        self._send(cmd)
 
     def configure_light(self, number, subtype, config, platform_settings):
         """Configure light in platform."""
@@ -1,6 +1,7 @@
 """PKONE serial communicator."""
 import asyncio
 import re
+from typing import Optional
 from distutils.version import StrictVersion
 
 from mpf.platforms.base_serial_communicator import BaseSerialCommunicator
@@ -16,15 +17,88 @@ EXTENSION_MIN_FW = '1.0'
 LIGHTSHOW_MIN_FW = '1.0'
 
 
+class PKONETxBatcher:
+
+    """Coalesces outgoing PKONE messages into as few serial writes as possible.
+
+    A message queued while the link is idle is written with the next loop iteration. This alone only matches what the
+    serial transport already does since it joins all writes of one loop iteration. On top of that, while messages
+    keep arriving (the previous write was less than coalesce_time ago) writes are delayed by coalesce_time, and the
+    delay is extended by every new message up to max_coalesce_time. This joins bursts spread over several loop
+    iterations while bounding the latency of any command (e.g. a coil pulse during a light or servo burst) to 1-2ms.
+    The buffer is written immediately once it reaches max_buffer_size (4096 bytes by default).
+    """
+
+    __slots__ = ["_loop", "_send_raw", "_buffer", "_flush_handle", "_flush_time", "_window_start", "_last_flush",
+                 "coalesce_time", "max_coalesce_time", "max_buffer_size"]
+
+    # pylint: disable-msg=too-many-arguments
+    def __init__(self, loop: asyncio.AbstractEventLoop, send_raw, coalesce_time=.001, max_coalesce_time=.002,
+                 max_buffer_size=4096) -> None:
+        """Initialise batcher."""
+        self._loop = loop
+        self._send_raw = send_raw
+        self._buffer = bytearray()
+        self._flush_handle = None       # type: Optional[asyncio.Handle]
+        self._flush_time = None         # type: Optional[float]
+        self._window_start = 0.0
+        self._last_flush = None         # type: Optional[float]
+        self.coalesce_time = coalesce_time
+        self.max_coalesce_time = max_coalesce_time
+        self.max_buffer_size = max_buffer_size
+
+    def queue(self, msg: bytes):
+        """Queue a message (without terminator) to be written with the next batch."""
+        self._buffer += msg + b'E'
+
+        if len(self._buffer) >= self.max_buffer_size:
+            self.flush()
+            return
+
+        now = self._loop.time()
+        if self._flush_handle is None:
+            self._window_start = now
+            if self._last_flush is None or now - self._last_flush > self.coalesce_time:
+                # link is idle. write with the next loop iteration
+                self._flush_handle = self._loop.call_soon(self.flush)
+            else:
+                # link is busy. wait a bit for more messages
+                self._schedule_flush(now + self.coalesce_time)
+        elif self._flush_time is not None:
+            # extend the coalesce window (but never beyond its maximum length)
+            flush_time = min(now + self.coalesce_time, self._window_start + self.max_coalesce_time)
+            if flush_time > self._flush_time:
+                self._flush_handle.cancel()
+                self._schedule_flush(flush_time)
+
+    def _schedule_flush(self, flush_time):
+        self._flush_time = flush_time
+        self._flush_handle = self._loop.call_at(flush_time, self.flush)
+
+    def flush(self):
+        """Write all queued messages now."""
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+            self._flush_time = None
+
+        if not self._buffer:
+            return
+
+        self._last_flush = self._loop.time()
+        self._send_raw(bytes(self._buffer))
+        self._buffer.clear()
+
+
 class PKONESerialCommunicator(BaseSerialCommunicator):
 
     """Handles the serial communication to the PKONE platform."""
 
-    ignored_messages = ['PWD',  # Watchdog
+    ignored_messages = [b'PWD',  # Watchdog
                         ]
 
     __slots__ = ["part_msg", "send_queue", "remote_firmware", "remote_hardware_rev", "received_msg",
-                 "max_messages_in_flight", "messages_in_flight", "send_ready"]
+                 "max_messages_in_flight", "messages_in_flight", "send_ready", "tx_batcher"]
 
     # pylint: disable=too-many-arguments
     def __init__(self, platform: "PKONEHardwarePlatform", port, baud) -> None:
@@ -48,6 +122,8 @@ class PKONESerialCommunicator(BaseSerialCommunicator):
 
         super().__init__(platform, port, baud)
 
+        self.tx_batcher = PKONETxBatcher(self.machine.clock.loop, self.send_raw)
+
     async def _read_with_timeout(self, timeout):
         try:
             msg_raw = await asyncio.wait_for(self.readuntil(b'E'), timeout=timeout)
@@ -198,11 +274,11 @@ class PKONESerialCommunicator(BaseSerialCommunicator):
         self.platform.debug_log('Reading all switches.')
         for address_id in self.platform.pkone_extensions:
             self.writer.write('PSA{}E'.format(address_id).encode())
-            msg = ''
-            while not msg.startswith('PSA'):
-                msg = (await self.readuntil(b'E')).decode()
-                if not msg.startswith('PSA'):
-                    self.platform.log.warning("Received unexpected message from PKONE: {}".format(msg))
+            msg = b''
+            while not msg.startswith(b'PSA'):
+                msg = await self.readuntil(b'E')
+                if not msg.startswith(b'PSA'):
+                    self.platform.log.warning("Received unexpected message from PKONE: {}".format(msg.decode()))
 
             self.platform.process_received_message(msg)
 
@@ -229,17 +305,41 @@ class PKONESerialCommunicator(BaseSerialCommunicator):
             if not msg:
                 continue
 
-            if msg.decode() not in self.ignored_messages:
-                self.platform.process_received_message(msg.decode())
+            if msg not in self.ignored_messages:
+                self.platform.process_received_message(msg)
 
     def send(self, msg):
         """Send a message to the remote processor over the serial connection.
 
+        The message is batched with other messages by the tx_batcher.
+
         Args:
         ----
-            msg: Bytes of the message you want to send.
+            msg: The message (without terminator) you want to send.
         """
         if self.debug:
             self.log.debug("%s sending: %s", self, msg)
 
-        self.writer.write(msg.encode() + b'E')
+        self.tx_batcher.queue(msg.encode())
+
+    async def drain(self):
+        """Wait until all queued and buffered messages have been transmitted by the serial port."""
+        self.tx_batcher.flush()
+        # with a high water mark of 0 drain() only returns once the write buffer is empty
+        self.writer.transport.set_write_buffer_limits(0, 0)
+        await self.writer.drain()
+        # the bytes have been handed to the OS. wait until they actually went out on the wire
+        # (closing the port may otherwise drop pending writes, e.g. on Windows). poll instead of calling the
+        # blocking serial.flush() so the caller can cancel the wait (e.g. with a timeout)
+        serial = self.writer.transport.serial
+        while serial.out_waiting:
+            await asyncio.sleep(.001)
+
+    def send_raw(self, msg: bytes):
+        """Write raw bytes (one or more complete messages) to the serial connection without batching.
+
+        Args:
+        ----
+            msg: Bytes of the messages (including terminators) you want to send.
+        """
+        self.writer.write(msg)
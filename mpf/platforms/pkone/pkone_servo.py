@@ -3,10 +3,6 @@ from collections import namedtuple
 
 from mpf.platforms.interfaces.servo_platform_interface import ServoPlatformInterface
 
-MYPY = False
-if MYPY:  # pragma: no cover
-    from mpf.platforms.pkone.pkone import PKONEHardwarePlatform  # pylint: disable-msg=cyclic-import,unused-import
-
 PKONEServoNumber = namedtuple("PKONEServoNumber", ["board_address_id", "servo_number"])
 
 
@@ -14,12 +10,13 @@ class PKONEServo(ServoPlatformInterface):
 
     """A servo in the PKONE platform."""
 
-    __slots__ = ["number", "platform"]
+    __slots__ = ["number", "send", "_cmd_prefix"]
 
-    def __init__(self, number: PKONEServoNumber, platform: "PKONEHardwarePlatform"):
+    def __init__(self, number: PKONEServoNumber, sender):
         """Initialise servo."""
         self.number = number
-        self.platform = platform
+        self.send = sender
+        self._cmd_prefix = 'PSC{}{:02d}'.format(number.board_address_id, number.servo_number)
 
     def go_to_position(self, position):
         """Set a servo position."""
@@ -29,15 +26,16 @@ class PKONEServo(ServoPlatformInterface):
         # convert from [0,1] to [0, 250]
         position_numeric = int(position * 250)
 
-        cmd = 'PSC{}{:02d}{:03d}'.format(
-            self.number.board_address_id,
-            self.number.servo_number,
-            position_numeric)
-
-        self.platform.send(cmd)
+        self.send(self._cmd_prefix + '%03d' % position_numeric)
 
     def set_speed_limit(self, speed_limit):
-        """Not implemented."""
+        """Not implemented.
+
+        The PKONE hardware does not support a servo speed limit.
+        """
 
     def set_acceleration_limit(self, acceleration_limit):
-        """Not implemented."""
+        """Not implemented.
+
+        The PKONE hardware does not support a servo acceleration limit.
+        """
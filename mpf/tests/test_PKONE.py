@@ -1,3 +1,5 @@
+from unittest.mock import MagicMock
+
 from mpf.core.platform import SwitchConfig
 from mpf.core.rgb_color import RGBColor
 from mpf.platforms.pkone.pkone import PKONEHardwarePlatform
@@ -17,6 +19,7 @@ class BaseMockPKONE(MockSerial):
         self.ignore_commands = {}
         self.sent_commands = []
         self.validate_expected_commands_mode = True
+        self.write_count = 0
 
     def reset(self):
         self.expected_commands = {}
@@ -40,6 +43,7 @@ class BaseMockPKONE(MockSerial):
         return False
 
     def write(self, msg):
+        self.write_count += 1
         parts = msg.split(b'E')
         # remove last newline
         assert parts.pop() == b''
@@ -368,6 +372,84 @@ class TestPKONE(MpfTestCase):
         self.advance_time_and_run(.1)
         self.assertFalse(self.controller.expected_commands)
 
+        # stop the watchdog so its pings are not counted as writes below
+        self.machine.default_platform._watchdog_task.cancel()
+
+        # count writes to the stream writer (the serial transport would also join writes made in the same
+        # loop iteration, so counting serial writes would not show the batching)
+        writer = self.machine.default_platform.controller_connection.writer
+        writer.write = MagicMock(wraps=writer.write)
+
+        # moving multiple servos at once is written in a single batch
+        self.controller.expected_commands = {
+                "PSC011015": None,
+                "PSC014250": None
+        }
+        self.machine.servos["servo1"].go_to_position(.5)
+        self.machine.servos["servo2"].go_to_position(1)
+        self.advance_time_and_run(.1)
+        self.assertFalse(self.controller.expected_commands)
+        self.assertEqual(1, writer.write.call_count)
+
+        # moves at different times are written separately
+        self.controller.expected_commands = {
+                "PSC011027": None,
+                "PSC014000": None
+        }
+        writer.write.reset_mock()
+        self.machine.servos["servo1"].go_to_position(1)
+        self.advance_time_and_run(.1)
+        self.assertEqual(1, writer.write.call_count)
+        self.machine.servos["servo2"].go_to_position(0)
+        self.advance_time_and_run(.1)
+        self.assertFalse(self.controller.expected_commands)
+        self.assertEqual(2, writer.write.call_count)
+
+        del writer.write
+
+    def test_tx_batching(self):
+        connection = self.machine.default_platform.controller_connection
+        batcher = connection.tx_batcher
+
+        # stop the watchdog so its pings do not interfere with the write timing
+        self.machine.default_platform._watchdog_task.cancel()
+        self.advance_time_and_run(1)
+
+        # a message on an idle link is written with the next loop iteration
+        self.controller.write_count = 0
+        connection.send("PWD")
+        self.assertEqual(0, self.controller.write_count)
+        self.advance_time_and_run(0)
+        self.assertEqual(1, self.controller.write_count)
+
+        # the link is busy now. the next message is held for coalesce_time
+        connection.send("PWD")
+        self.advance_time_and_run(batcher.coalesce_time / 2)
+        self.assertEqual(1, self.controller.write_count)
+        self.advance_time_and_run(batcher.coalesce_time)
+        self.assertEqual(2, self.controller.write_count)
+
+        # continuous messages extend the hold but never beyond max_coalesce_time
+        start = self.loop.time()
+        for _ in range(100):
+            connection.send("PWD")
+            self.advance_time_and_run(batcher.coalesce_time / 2)
+            if self.controller.write_count > 2:
+                break
+        self.assertEqual(3, self.controller.write_count)
+        self.assertLessEqual(self.loop.time() - start, batcher.max_coalesce_time + batcher.coalesce_time / 2)
+
+        # a full buffer is written immediately (even though the link is busy)
+        self.advance_time_and_run(.1)
+        self.controller.write_count = 0
+        connection.send("PWD")
+        self.advance_time_and_run(0)
+        self.assertEqual(1, self.controller.write_count)
+        for _ in range(batcher.max_buffer_size // len(b"PWDE")):
+            connection.send("PWD")
+        self.advance_time_and_run(0)
+        self.assertEqual(2, self.controller.write_count)
+
     def _switch_hit_cb(self, **kwargs):
         self.switch_hit = True
 
@@ -405,6 +487,10 @@ class TestPKONE(MpfTestCase):
         with self.assertRaises(AssertionError):
             self.machine.default_platform.configure_switch('0-0', SwitchConfig(name="", debounce='auto', invert=0), {})
 
+        # invalid number format
+        with self.assertRaises(AssertionError):
+            self.machine.default_platform.configure_switch('0-a', SwitchConfig(name="", debounce='auto', invert=0), {})
+
     def _test_switch_changes(self):
         self.assertIsInstance(self.machine.default_platform, PKONEHardwarePlatform)
         self.switch_hit = False
@@ -413,18 +499,23 @@ class TestPKONE(MpfTestCase):
         self.assertFalse(self.switch_hit)
 
         self.machine.events.add_handler("s_test_active", self._switch_hit_cb)
-        self.machine.default_platform.process_received_message("PSW0071E")
+        self.machine.default_platform.process_received_message(b"PSW0071E")
         self.advance_time_and_run(1)
 
         self.assertTrue(self.switch_hit)
         self.assertSwitchState("s_test", 1)
         self.switch_hit = False
 
+        # switch changes are reflected in the hardware states
+        hw_states = self.loop.run_until_complete(self.machine.default_platform.get_hw_switch_states())
+        self.assertEqual(1, hw_states[self.machine.switches["s_test"].hw_switch.number])
+        self.assertEqual(35 * 2, len(hw_states))
+
         self.advance_time_and_run(1)
         self.assertFalse(self.switch_hit)
         self.assertSwitchState("s_test", 1)
 
-        self.machine.default_platform.process_received_message("PSW0070E")
+        self.machine.default_platform.process_received_message(b"PSW0070E")
         self.advance_time_and_run(1)
         self.assertFalse(self.switch_hit)
         self.assertSwitchState("s_test", 0)
@@ -440,13 +531,13 @@ class TestPKONE(MpfTestCase):
         self.assertFalse(self.switch_hit)
         self.assertSwitchState("s_test_nc", 1)
 
-        self.machine.default_platform.process_received_message("PSW0261E")
+        self.machine.default_platform.process_received_message(b"PSW0261E")
         self.advance_time_and_run(1)
         self.assertFalse(self.switch_hit)
         self.assertSwitchState("s_test_nc", 0)
 
         self.machine.events.add_handler("s_test_nc_active", self._switch_hit_cb)
-        self.machine.default_platform.process_received_message("PSW0260E")
+        self.machine.default_platform.process_received_message(b"PSW0260E")
         self.advance_time_and_run(1)
 
         self.assertSwitchState("s_test_nc", 1)